@@ -1,10 +1,24 @@
 import json
+import multiprocessing as mp
 import os
+import queue
 import time
 
 import geopandas as gpd
 import numpy as np
-from pyscipopt import Model, quicksum
+from pyscipopt import (
+    SCIP_EVENTTYPE,
+    SCIP_HEURTIMING,
+    SCIP_PARAMEMPHASIS,
+    SCIP_PARAMSETTING,
+    SCIP_RESULT,
+    Eventhdlr,
+    Heur,
+    Model,
+    quicksum,
+)
+from scipy import sparse
+from scipy.optimize import linear_sum_assignment, linprog
 from shapely.geometry import Point
 
 
@@ -42,29 +56,29 @@ def create_dummy_prac_data() -> gpd.GeoDataFrame:
     return gpd.GeoDataFrame(dummy_data, crs="EPSG:32633")
 
 
-def solve_capacitated_flp(
-    cost_matrix: dict,
-    facility_capacities: dict,
-    demand_quantities: dict,
-    fixcost: float = 0.001,
-    time_limit: int = 600,
-) -> tuple[list, dict, float]:
-    """
-    Solves the Capacitated Facility Location Problem using PySCIPOpt.
-    """
-    print("\nSolving Facility Location Problem with PySCIPOpt...")
+# Objective penalty for demand-facility pairs without a cost entry
+_MISSING_PAIR_COST = 1e9
 
-    model = Model("flp")
-    model.setParam("limits/time", time_limit)
 
-    # Sets
+def _collect_ids(cost_matrix: dict) -> tuple[list, list]:
+    """
+    Extracts the demand point and facility ids from the cost matrix, in
+    first-seen order so that every process derives the same ordering.
+    """
     demand_points_ids = list(cost_matrix.keys())
-    facilities_ids = list({f_id for d in cost_matrix.values() for f_id in d})
+    facilities_ids = list(
+        dict.fromkeys(f_id for d in cost_matrix.values() for f_id in d)
+    )
+    return demand_points_ids, facilities_ids
 
-    if not demand_points_ids or not facilities_ids:
-        print("No demand points or facilities found. Exiting.")
-        return [], {}, 0.0
 
+def _validate_inputs(
+    demand_points_ids: list,
+    facilities_ids: list,
+    facility_capacities: dict,
+    demand_quantities: dict,
+) -> None:
+    """Checks that every demand point and facility has a demand or capacity."""
     for d_id in demand_points_ids:
         if d_id not in demand_quantities:
             raise ValueError(f"Missing demand quantity for '{d_id}'")
@@ -72,6 +86,26 @@ def solve_capacitated_flp(
         if f_id not in facility_capacities:
             raise ValueError(f"Missing capacity for facility '{f_id}'")
 
+
+def _add_flp_model(
+    model: Model,
+    cost_matrix: dict,
+    facility_capacities: dict,
+    demand_quantities: dict,
+    fixcost: float,
+    demand_points_ids: list,
+    facilities_ids: list,
+    formulation: str = "strong",
+) -> tuple[dict, dict]:
+    """
+    Adds the CFLP variables, objective and constraints to the given model for
+    the already validated demand point and facility ids.
+    The "strong" formulation links every x to y individually, the "aggregated"
+    formulation relies on the capacity constraints alone (smaller, weaker LP).
+    """
+    if formulation not in ("strong", "aggregated"):
+        raise ValueError(f"Unknown formulation '{formulation}'")
+
     # Variables
     x = {
         (d_id, f_id): model.addVar(vtype="B", name=f"x_{d_id}_{f_id}")
@@ -83,7 +117,9 @@ def solve_capacitated_flp(
     # Objective
     model.setObjective(
         quicksum(
-            cost_matrix[d_id].get(f_id, 1e9) * demand_quantities[d_id] * x[(d_id, f_id)]
+            cost_matrix[d_id].get(f_id, _MISSING_PAIR_COST)
+            * demand_quantities[d_id]
+            * x[(d_id, f_id)]
             for d_id in demand_points_ids
             for f_id in facilities_ids
         )
@@ -95,9 +131,10 @@ def solve_capacitated_flp(
     for d_id in demand_points_ids:
         model.addCons(quicksum(x[(d_id, f_id)] for f_id in facilities_ids) == 1)
 
-    for d_id in demand_points_ids:
-        for f_id in facilities_ids:
-            model.addCons(x[(d_id, f_id)] <= y[f_id])
+    if formulation == "strong":
+        for d_id in demand_points_ids:
+            for f_id in facilities_ids:
+                model.addCons(x[(d_id, f_id)] <= y[f_id])
 
     for f_id in facilities_ids:
         model.addCons(
@@ -107,6 +144,58 @@ def solve_capacitated_flp(
             <= facility_capacities[f_id] * y[f_id]
         )
 
+    return x, y
+
+
+def _save_assignments(
+    assignments: dict, assignment_results_path: str = "data/cflp_assignments.json"
+) -> None:
+    """Saves the assignments as JSON, reporting (not raising) any I/O error."""
+    try:
+        os.makedirs(os.path.dirname(assignment_results_path), exist_ok=True)
+        with open(assignment_results_path, "w") as f:
+            json.dump(assignments, f, indent=2, cls=NpEncoder)
+        print(f"\nAssignments saved to {assignment_results_path}")
+    except Exception as e:
+        print(f"Error saving results: {e}")
+
+
+def solve_capacitated_flp(
+    cost_matrix: dict,
+    facility_capacities: dict,
+    demand_quantities: dict,
+    fixcost: float = 0.001,
+    time_limit: int = 600,
+) -> tuple[list, dict, float]:
+    """
+    Solves the Capacitated Facility Location Problem using PySCIPOpt.
+    """
+    print("\nSolving Facility Location Problem with PySCIPOpt...")
+
+    model = Model("flp")
+    model.setParam("limits/time", time_limit)
+
+    # Sets
+    demand_points_ids, facilities_ids = _collect_ids(cost_matrix)
+
+    if not demand_points_ids or not facilities_ids:
+        print("No demand points or facilities found. Exiting.")
+        return [], {}, 0.0
+
+    _validate_inputs(
+        demand_points_ids, facilities_ids, facility_capacities, demand_quantities
+    )
+
+    x, y = _add_flp_model(
+        model,
+        cost_matrix,
+        facility_capacities,
+        demand_quantities,
+        fixcost,
+        demand_points_ids,
+        facilities_ids,
+    )
+
     print("Starting optimization...")
     start_time = time.time()
     model.optimize()
@@ -130,7 +219,8 @@ def solve_capacitated_flp(
                 if model.getVal(x[(d_id, f_id)]) > 0.5:
                     assignments[d_id] = f_id
                     total_assignment_cost += (
-                        cost_matrix[d_id].get(f_id, 1e9) * demand_quantities[d_id]
+                        cost_matrix[d_id].get(f_id, _MISSING_PAIR_COST)
+                        * demand_quantities[d_id]
                     )
                     facility_loads[f_id] += demand_quantities[d_id]
                     break
@@ -141,15 +231,7 @@ def solve_capacitated_flp(
             f"Total Cost: {total_assignment_cost + len(open_facilities) * fixcost:.2f}"
         )
 
-        # Save assignments
-        assignment_results_path = "data/cflp_assignments.json"
-        try:
-            os.makedirs(os.path.dirname(assignment_results_path), exist_ok=True)
-            with open(assignment_results_path, "w") as f:
-                json.dump(assignments, f, indent=2, cls=NpEncoder)
-            print(f"\nAssignments saved to {assignment_results_path}")
-        except Exception as e:
-            print(f"Error saving results: {e}")
+        _save_assignments(assignments)
 
         return open_facilities, assignments, solving_time
     else:
@@ -157,6 +239,650 @@ def solve_capacitated_flp(
         return [], {}, solving_time
 
 
+# Above this many capacity-expanded cells the assignment is solved as an LP
+_MAX_EXPANDED_ENTRIES = 10_000_000
+
+
+def _build_cost_array(
+    cost_matrix: dict, demand_points_ids: list, facilities_ids: list
+) -> np.ndarray:
+    """
+    Converts the nested cost matrix dict into a dense (demand x facility) array.
+    Missing pairs are forbidden and get an infinite cost.
+    """
+    cost_array = np.full((len(demand_points_ids), len(facilities_ids)), np.inf)
+    f_index = {f_id: j for j, f_id in enumerate(facilities_ids)}
+    for i, d_id in enumerate(demand_points_ids):
+        for f_id, cost in cost_matrix[d_id].items():
+            cost_array[i, f_index[f_id]] = cost
+    return cost_array
+
+
+def _evaluate_open_set(
+    cost_array: np.ndarray,
+    demand_points_ids: list,
+    facilities_ids: list,
+    capacities: np.ndarray,
+    demand_unit: float,
+    open_facilities,
+    fixcost: float,
+) -> tuple[dict, dict, float]:
+    """
+    Solves the capacitated assignment for one open-set on a prebuilt cost array.
+    Small instances expand every open facility into one column per demand unit it
+    can serve and solve a rectangular linear assignment; if that matrix would be
+    too large the transportation LP is solved instead.
+    """
+    f_index = {f_id: j for j, f_id in enumerate(facilities_ids)}
+    for f_id in open_facilities:
+        if f_id not in f_index:
+            raise ValueError(f"Unknown facility '{f_id}' in open set")
+
+    open_idx = np.array(sorted({f_index[f_id] for f_id in open_facilities}), dtype=int)
+    facility_loads = {facilities_ids[j]: 0.0 for j in open_idx}
+    if open_idx.size == 0:
+        return {}, facility_loads, 0.0 if not demand_points_ids else float("inf")
+
+    slots = np.floor(capacities[open_idx] / demand_unit + 1e-9).astype(int)
+    slots = np.minimum(np.maximum(slots, 0), len(demand_points_ids))
+    if slots.sum() < len(demand_points_ids):
+        return {}, facility_loads, float("inf")
+
+    open_costs = cost_array[:, open_idx]
+    if len(demand_points_ids) * slots.sum() <= _MAX_EXPANDED_ENTRIES:
+        chosen = _solve_expanded_assignment(open_costs, slots)
+    else:
+        chosen = _solve_transportation_lp(open_costs, slots)
+    if chosen is None:
+        # No assignment avoids the forbidden (missing) pairs
+        return {}, facility_loads, float("inf")
+
+    assigned_idx = open_idx[chosen]
+    assignments = {
+        d_id: facilities_ids[j] for d_id, j in zip(demand_points_ids, assigned_idx)
+    }
+    for j in assigned_idx:
+        facility_loads[facilities_ids[j]] += demand_unit
+
+    rows = np.arange(len(demand_points_ids))
+    total_cost = (
+        float(open_costs[rows, chosen].sum()) * demand_unit + len(open_idx) * fixcost
+    )
+    return assignments, facility_loads, total_cost
+
+
+def _solve_expanded_assignment(
+    open_costs: np.ndarray, slots: np.ndarray
+) -> np.ndarray | None:
+    """
+    Returns the chosen open-facility column per demand row via a linear
+    assignment on capacity-expanded columns, or None if infeasible.
+    """
+    slot_columns = np.repeat(np.arange(len(slots)), slots)
+    try:
+        rows, cols = linear_sum_assignment(open_costs[:, slot_columns])
+    except ValueError:
+        return None
+    chosen = np.empty(open_costs.shape[0], dtype=int)
+    chosen[rows] = slot_columns[cols]
+    return chosen
+
+
+def _solve_transportation_lp(
+    open_costs: np.ndarray, slots: np.ndarray
+) -> np.ndarray | None:
+    """
+    Same result as _solve_expanded_assignment but as a transportation LP with
+    one variable per demand-facility pair. The constraint matrix is totally
+    unimodular, so the simplex vertex returned by HiGHS is integral.
+    """
+    n_demand, n_open = open_costs.shape
+    allowed = np.isfinite(open_costs).ravel()
+    costs = np.where(allowed, open_costs.ravel(), 0.0)
+    bounds = np.column_stack([np.zeros(allowed.size), allowed.astype(float)])
+
+    a_eq = sparse.kron(sparse.eye(n_demand), np.ones((1, n_open)), format="csr")
+    a_ub = sparse.kron(np.ones((1, n_demand)), sparse.eye(n_open), format="csr")
+    result = linprog(
+        costs,
+        A_ub=a_ub,
+        b_ub=slots,
+        A_eq=a_eq,
+        b_eq=np.ones(n_demand),
+        bounds=bounds,
+        method="highs-ds",
+    )
+    if result.status != 0:
+        return None
+    return result.x.reshape(n_demand, n_open).argmax(axis=1)
+
+
+def _prepare_evaluation(
+    cost_matrix: dict, facility_capacities: dict, demand_quantities: dict
+) -> tuple[np.ndarray, list, list, np.ndarray, float]:
+    """
+    Validates the inputs and builds the arrays shared by all open-set evaluations.
+    """
+    demand_points_ids, facilities_ids = _collect_ids(cost_matrix)
+    _validate_inputs(
+        demand_points_ids, facilities_ids, facility_capacities, demand_quantities
+    )
+
+    demands = {demand_quantities[d_id] for d_id in demand_points_ids}
+    if len(demands) > 1:
+        raise ValueError(
+            "Fixed-facility evaluation requires a uniform demand quantity; "
+            "single-source assignment with unequal demands needs the MIP solver."
+        )
+    demand_unit = float(demands.pop()) if demands else 1.0
+    if demand_unit <= 0:
+        raise ValueError("Demand quantities must be positive")
+
+    cost_array = _build_cost_array(cost_matrix, demand_points_ids, facilities_ids)
+    capacities = np.array(
+        [facility_capacities[f_id] for f_id in facilities_ids], dtype=float
+    )
+    return cost_array, demand_points_ids, facilities_ids, capacities, demand_unit
+
+
+def evaluate_fixed_facilities(
+    cost_matrix: dict,
+    facility_capacities: dict,
+    demand_quantities: dict,
+    open_facilities,
+    fixcost: float = 0.001,
+) -> tuple[dict, dict, float]:
+    """
+    Computes the optimal assignment for a fixed set of open facilities.
+
+    Only the capacitated assignment is solved (no facility decisions), so this
+    answers "what if exactly these pharmacies are open" without a MIP run.
+    Returns (assignments, facility_loads, total_cost) where total_cost includes
+    the opening cost of the given facilities. An infeasible open-set (not enough
+    capacity, or a demand point that can only be served through a pair missing
+    from the cost matrix) yields an empty assignment and a total cost of inf.
+
+    With small capacities (as in the default setup) the assignment is solved on
+    capacity-expanded columns, which takes milliseconds. Once that expanded
+    matrix would exceed _MAX_EXPANDED_ENTRIES cells, a transportation LP with
+    one variable per demand-facility pair is solved with HiGHS instead.
+    """
+    return evaluate_open_sets(
+        cost_matrix,
+        facility_capacities,
+        demand_quantities,
+        [open_facilities],
+        fixcost=fixcost,
+    )[0]
+
+
+def evaluate_open_sets(
+    cost_matrix: dict,
+    facility_capacities: dict,
+    demand_quantities: dict,
+    open_sets: list,
+    fixcost: float = 0.001,
+) -> list[tuple[dict, dict, float]]:
+    """
+    Batch version of evaluate_fixed_facilities for many candidate open-sets.
+    The dense cost array is built once and reused for every evaluation.
+    """
+    cost_array, demand_points_ids, facilities_ids, capacities, demand_unit = (
+        _prepare_evaluation(cost_matrix, facility_capacities, demand_quantities)
+    )
+    return [
+        _evaluate_open_set(
+            cost_array,
+            demand_points_ids,
+            facilities_ids,
+            capacities,
+            demand_unit,
+            open_set,
+            fixcost,
+        )
+        for open_set in open_sets
+    ]
+
+
+# Each entry configures one portfolio worker. Supported keys: "name",
+# "formulation" ("strong" | "aggregated"), "emphasis" (SCIP_PARAMEMPHASIS name),
+# "heuristics" (SCIP_PARAMSETTING name), "seed" and raw SCIP "params".
+DEFAULT_PORTFOLIO = [
+    {"name": "default"},
+    {"name": "aggregated", "formulation": "aggregated"},
+    {"name": "optimality", "emphasis": "optimality", "seed": 1},
+    {"name": "feasibility", "emphasis": "feasibility", "seed": 2},
+    {"name": "aggressive_heuristics", "heuristics": "aggressive", "seed": 3},
+    {"name": "aggregated_seed", "formulation": "aggregated", "seed": 4},
+]
+
+# Seconds between checks of the result queue and worker liveness
+_PORTFOLIO_POLL_INTERVAL = 0.1
+# Extra seconds past time_limit before unresponsive workers are terminated
+_PORTFOLIO_GRACE_PERIOD = 30.0
+
+
+def _publish_incumbent(shared: dict, obj: float, chosen: list) -> None:
+    """
+    Stores a solution in the shared state if it improves the shared incumbent.
+    chosen holds the facility index (in _collect_ids order) of every demand point.
+    """
+    with shared["primal"].get_lock():
+        if obj >= shared["primal"].value - 1e-9:
+            return
+        shared["primal"].value = obj
+        shared["incumbent"][:] = chosen
+        shared["version"].value += 1
+
+
+def _read_incumbent(shared: dict) -> tuple[int, float, list]:
+    """Returns (version, objective, chosen) of the shared incumbent."""
+    with shared["primal"].get_lock():
+        return (
+            shared["version"].value,
+            shared["primal"].value,
+            list(shared["incumbent"]),
+        )
+
+
+def _chosen_facilities(
+    model: Model, sol, x: dict, demand_points_ids: list, facilities_ids: list
+) -> list:
+    """Encodes a solution as the facility index assigned to each demand point."""
+    chosen = []
+    for d_id in demand_points_ids:
+        for j, f_id in enumerate(facilities_ids):
+            if model.getSolVal(sol, x[(d_id, f_id)]) > 0.5:
+                chosen.append(j)
+                break
+    return chosen
+
+
+def _decode_incumbent(
+    chosen: list, demand_points_ids: list, facilities_ids: list
+) -> tuple[list, dict]:
+    """Turns an encoded incumbent back into (open_facilities, assignments)."""
+    assignments = {
+        d_id: facilities_ids[j] for d_id, j in zip(demand_points_ids, chosen)
+    }
+    return list(dict.fromkeys(assignments.values())), assignments
+
+
+class _PortfolioEventhdlr(Eventhdlr):
+    """
+    Publishes this worker's incumbents and dual bound to the shared portfolio
+    state, tightens the objective limit to the best incumbent of any worker and
+    interrupts the solve once the combined bounds close the target gap or
+    another worker has already finished.
+    """
+
+    EVENTS = (
+        SCIP_EVENTTYPE.BESTSOLFOUND
+        | SCIP_EVENTTYPE.NODESOLVED
+        | SCIP_EVENTTYPE.LPSOLVED
+    )
+
+    def __init__(self, shared, gap, x, demand_points_ids, facilities_ids):
+        self.shared = shared
+        self.gap = gap
+        self.x = x
+        self.demand_points_ids = demand_points_ids
+        self.facilities_ids = facilities_ids
+        self.objlimit = float("inf")
+
+    def eventinit(self):
+        self.model.catchEvent(self.EVENTS, self)
+
+    def eventexit(self):
+        self.model.dropEvent(self.EVENTS, self)
+
+    def eventexec(self, event):
+        if self.shared["stop_event"].is_set():
+            self.model.interruptSolve()
+            return
+
+        is_best_sol_event = event.getType() == SCIP_EVENTTYPE.BESTSOLFOUND
+        if is_best_sol_event:
+            sol = self.model.getBestSol()
+            obj = self.model.getSolObjVal(sol)
+            if obj < self.shared["primal"].value - 1e-9:
+                chosen = _chosen_facilities(
+                    self.model, sol, self.x, self.demand_points_ids, self.facilities_ids
+                )
+                _publish_incumbent(self.shared, obj, chosen)
+
+        # Any worker's incumbent and any worker's dual bound are valid for the
+        # same instance, so together they can prove optimality early.
+        primal = self.shared["primal"].value
+        with self.shared["dual"].get_lock():
+            self.shared["dual"].value = max(
+                self.shared["dual"].value, self.model.getDualbound()
+            )
+            dual = self.shared["dual"].value
+
+        # Prune this worker's search with the best incumbent of any worker. Only
+        # on node and LP events: during BESTSOLFOUND SCIP is still installing the
+        # new solution and rejects a limit below it.
+        if not is_best_sol_event and primal < self.objlimit:
+            self.model.setObjlimit(primal)
+            self.objlimit = primal
+
+        if _portfolio_gap(primal, dual) <= self.gap:
+            self.shared["stop_event"].set()
+            self.model.interruptSolve()
+
+
+class _PortfolioHeur(Heur):
+    """Injects the shared incumbent of other workers into this worker's solve."""
+
+    def __init__(self, shared, x, y, demand_points_ids, facilities_ids):
+        self.shared = shared
+        self.x = x
+        self.y = y
+        self.demand_points_ids = demand_points_ids
+        self.facilities_ids = facilities_ids
+        self.seen_version = 0
+
+    def heurexec(self, heurtiming, nodeinfeasible):
+        version, primal, chosen = _read_incumbent(self.shared)
+        if version == self.seen_version:
+            return {"result": SCIP_RESULT.DIDNOTRUN}
+        self.seen_version = version
+        # Compare with our own best solution, the primal bound includes the
+        # objective limit already tightened to the shared incumbent
+        if (
+            self.model.getNSols() > 0
+            and self.model.getSolObjVal(self.model.getBestSol()) <= primal + 1e-9
+        ):
+            return {"result": SCIP_RESULT.DIDNOTRUN}
+
+        sol = self.model.createSol(self)
+        for d_id, j in zip(self.demand_points_ids, chosen):
+            f_id = self.facilities_ids[j]
+            self.model.setSolVal(sol, self.x[(d_id, f_id)], 1.0)
+            self.model.setSolVal(sol, self.y[f_id], 1.0)
+        if self.model.trySol(sol):
+            return {"result": SCIP_RESULT.FOUNDSOL}
+        return {"result": SCIP_RESULT.DIDNOTFIND}
+
+
+def _portfolio_gap(primal: float, dual: float) -> float:
+    """Relative gap as defined by SCIP (inf while no incumbent exists)."""
+    if primal >= 1e20 or dual <= -1e20:
+        return float("inf")
+    if abs(primal - dual) <= 1e-9:
+        return 0.0
+    if primal * dual < 0 or min(abs(primal), abs(dual)) <= 1e-9:
+        return float("inf")
+    return abs(primal - dual) / min(abs(primal), abs(dual))
+
+
+def _apply_portfolio_config(model: Model, config: dict, gap: float) -> None:
+    """Applies one portfolio configuration's SCIP settings to the model."""
+    if "emphasis" in config:
+        model.setEmphasis(getattr(SCIP_PARAMEMPHASIS, config["emphasis"].upper()))
+    if "heuristics" in config:
+        model.setHeuristics(getattr(SCIP_PARAMSETTING, config["heuristics"].upper()))
+    # Presets must not switch off the injection of shared incumbents
+    model.setParam("heuristics/portfolio/freq", 1)
+    if "seed" in config:
+        model.setParam("randomization/randomseedshift", config["seed"])
+    for name, value in config.get("params", {}).items():
+        model.setParam(name, value)
+    model.setParam("limits/gap", gap)
+
+
+def _portfolio_worker(
+    index: int,
+    config: dict,
+    cost_matrix: dict,
+    facility_capacities: dict,
+    demand_quantities: dict,
+    fixcost: float,
+    time_limit: int,
+    gap: float,
+    shared: dict,
+    results,
+) -> None:
+    """
+    Runs one configured solve and reports the best solution known to it, its
+    own or the shared incumbent of another worker, to the parent.
+    """
+    name = config.get("name", "unnamed")
+    try:
+        model = Model(f"flp_{name}")
+        model.hideOutput()
+        model.setParam("limits/time", time_limit)
+        # The parent already validated the inputs
+        demand_points_ids, facilities_ids = _collect_ids(cost_matrix)
+        x, y = _add_flp_model(
+            model,
+            cost_matrix,
+            facility_capacities,
+            demand_quantities,
+            fixcost,
+            demand_points_ids,
+            facilities_ids,
+            formulation=config.get("formulation", "strong"),
+        )
+        model.includeEventhdlr(
+            _PortfolioEventhdlr(shared, gap, x, demand_points_ids, facilities_ids),
+            "portfolio",
+            "shares incumbents and bounds between portfolio workers",
+        )
+        model.includeHeur(
+            _PortfolioHeur(shared, x, y, demand_points_ids, facilities_ids),
+            "portfolio",
+            "injects incumbents found by other portfolio workers",
+            "P",
+            timingmask=SCIP_HEURTIMING.BEFORENODE | SCIP_HEURTIMING.AFTERLPNODE,
+        )
+        # Applied last so configurations can also tune the portfolio plugins
+        _apply_portfolio_config(model, config, gap)
+
+        model.optimize()
+        status = model.getStatus()
+
+        obj = float("inf")
+        if model.getNSols() > 0:
+            sol = model.getBestSol()
+            obj = model.getObjVal()
+            _publish_incumbent(
+                shared,
+                obj,
+                _chosen_facilities(model, sol, x, demand_points_ids, facilities_ids),
+            )
+
+        version, shared_obj, chosen = _read_incumbent(shared)
+        if status == "infeasible" and version > 0:
+            # Infeasible under the objective limit: nothing beats the shared
+            # incumbent, which is therefore optimal
+            status = "optimal"
+        if status in ["optimal", "gaplimit", "infeasible"]:
+            shared["stop_event"].set()
+
+        # Report the best known solution, which may come from another worker
+        if version > 0 and shared_obj < obj - 1e-9:
+            open_facilities, assignments = _decode_incumbent(
+                chosen, demand_points_ids, facilities_ids
+            )
+            results.put(
+                (index, (name, status, shared_obj, open_facilities, assignments))
+            )
+            return
+        if obj == float("inf"):
+            results.put((index, (name, status, obj, [], {})))
+            return
+
+        open_facilities = [f_id for f_id, var in y.items() if model.getVal(var) > 0.5]
+        assignments = {
+            d_id: f_id for (d_id, f_id), var in x.items() if model.getVal(var) > 0.5
+        }
+        results.put((index, (name, status, obj, open_facilities, assignments)))
+    except Exception as e:
+        results.put((index, (name, f"error: {e}", float("inf"), [], {})))
+
+
+def _portfolio_winner_reported(outcomes: dict, primal: float) -> bool:
+    """
+    Checks whether the result holding the shared best incumbent (or a proof of
+    infeasibility) has already reached the parent.
+    """
+    tolerance = 1e-6 * max(1.0, abs(primal))
+    return any(
+        status == "infeasible" or obj <= primal + tolerance
+        for _, status, obj, _, _ in outcomes.values()
+    )
+
+
+def solve_capacitated_flp_portfolio(
+    cost_matrix: dict,
+    facility_capacities: dict,
+    demand_quantities: dict,
+    fixcost: float = 0.001,
+    time_limit: int = 600,
+    configs: list | None = None,
+    n_workers: int | None = None,
+    gap: float = 0.0,
+) -> tuple[list, dict, float]:
+    """
+    Races several differently configured SCIP solves of the same CFLP instance
+    in parallel worker processes and returns the best solution found.
+
+    Workers share their incumbents through shared memory: every worker tightens
+    its objective limit to the best incumbent found so far and injects it into
+    its own search via a heuristic. All workers are stopped as soon as one proves
+    optimality or the combined primal and dual bounds reach the target gap.
+    Returns the same (open_facilities, assignments, solving_time) tuple as
+    solve_capacitated_flp.
+    """
+    print("\nSolving Facility Location Problem with a PySCIPOpt portfolio...")
+
+    demand_points_ids, facilities_ids = _collect_ids(cost_matrix)
+
+    if not demand_points_ids or not facilities_ids:
+        print("No demand points or facilities found. Exiting.")
+        return [], {}, 0.0
+
+    _validate_inputs(
+        demand_points_ids, facilities_ids, facility_capacities, demand_quantities
+    )
+
+    configs = list(configs if configs is not None else DEFAULT_PORTFOLIO)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    configs = configs[: max(1, n_workers)]
+    if not configs:
+        raise ValueError("Portfolio needs at least one configuration")
+
+    ctx = mp.get_context()
+    # The primal value's lock also guards the incumbent vector and its version
+    shared = {
+        "primal": ctx.Value("d", float("inf")),
+        "dual": ctx.Value("d", float("-inf")),
+        "incumbent": ctx.Array("i", len(demand_points_ids), lock=False),
+        "version": ctx.Value("i", 0, lock=False),
+        "stop_event": ctx.Event(),
+    }
+    results = ctx.Queue()
+
+    workers = [
+        ctx.Process(
+            target=_portfolio_worker,
+            args=(
+                index,
+                config,
+                cost_matrix,
+                facility_capacities,
+                demand_quantities,
+                fixcost,
+                time_limit,
+                gap,
+                shared,
+                results,
+            ),
+        )
+        for index, config in enumerate(configs)
+    ]
+
+    print(f"Starting {len(workers)} portfolio workers...")
+    start_time = time.time()
+    for worker in workers:
+        worker.start()
+
+    # Workers only check the stop event on SCIP events and may die without
+    # reporting, so poll instead of blocking and terminate the stragglers.
+    deadline = start_time + time_limit + _PORTFOLIO_GRACE_PERIOD
+    outcomes = {}
+    while len(outcomes) < len(workers):
+        try:
+            index, outcome = results.get(timeout=_PORTFOLIO_POLL_INTERVAL)
+            outcomes[index] = outcome
+            continue
+        except queue.Empty:
+            pass
+        if shared["stop_event"].is_set() and _portfolio_winner_reported(
+            outcomes, shared["primal"].value
+        ):
+            break
+        if time.time() > deadline:
+            print("Portfolio deadline exceeded, terminating remaining workers.")
+            break
+        if not any(worker.is_alive() for worker in workers):
+            # Results put just before exiting may still be in the pipe
+            try:
+                while True:
+                    index, outcome = results.get(timeout=_PORTFOLIO_POLL_INTERVAL)
+                    outcomes[index] = outcome
+            except queue.Empty:
+                break
+
+    # Workers may have reported and exited after the loop stopped reading
+    while True:
+        try:
+            index, outcome = results.get_nowait()
+        except queue.Empty:
+            break
+        outcomes[index] = outcome
+
+    for index, worker in enumerate(workers):
+        if index in outcomes:
+            worker.join()
+            continue
+        if worker.is_alive():
+            worker.terminate()
+            worker.join()
+            status = "terminated"
+        else:
+            worker.join()
+            if worker.exitcode != 0:
+                status = f"died (exit code {worker.exitcode})"
+            else:
+                status = "exited without result"
+        outcomes[index] = (
+            configs[index].get("name", "unnamed"),
+            status,
+            float("inf"),
+            [],
+            {},
+        )
+    end_time = time.time()
+    solving_time = end_time - start_time
+
+    outcomes = [outcomes[index] for index in range(len(workers))]
+    for name, status, obj, _, _ in outcomes:
+        print(f"  {name}: {status} | Objective: {obj:.2f}")
+
+    name, status, obj, open_facilities, assignments = min(outcomes, key=lambda o: o[2])
+    if obj == float("inf"):
+        print("\nNo portfolio worker found a feasible solution.")
+        return [], {}, solving_time
+
+    print(f"\nBest configuration: {name} | Status: {status} | Objective: {obj:.2f}")
+    _save_assignments(assignments)
+    return open_facilities, assignments, solving_time
+
+
 def _load_and_handle_gdf(
     project_data_path,
     file_name,
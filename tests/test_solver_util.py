@@ -0,0 +1,552 @@
+import multiprocessing as mp
+import os
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# Add the project root directory so that the helper package is importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import helper.solver_util as solver_util
+from helper.solver_util import (
+    _collect_ids,
+    _decode_incumbent,
+    _portfolio_gap,
+    _portfolio_worker,
+    _read_incumbent,
+    evaluate_fixed_facilities,
+    evaluate_open_sets,
+    solve_capacitated_flp,
+    solve_capacitated_flp_portfolio,
+)
+
+CAPACITY_BLOCKING_INSTANCE = {
+    "cost_matrix": {
+        "PRAC1": {"F_A": 1, "F_B": 10},
+        "PRAC2": {"F_A": 2, "F_B": 8},
+        "PRAC3": {"F_A": 3, "F_B": 5},
+    },
+    "facility_capacities": {"F_A": 2, "F_B": 1},
+    "demand_quantities": {"PRAC1": 1, "PRAC2": 1, "PRAC3": 1},
+    "fixcost": 0.5,
+}
+
+
+def _random_instance(n_demand=20, n_facilities=8, capacity=4, seed=0):
+    """Instance large enough that SCIP needs a search node without presolving."""
+    rng = np.random.default_rng(seed)
+    return {
+        "cost_matrix": {
+            f"PRAC{i}": {
+                f"F{j}": float(rng.integers(1, 100)) for j in range(n_facilities)
+            }
+            for i in range(n_demand)
+        },
+        "facility_capacities": {f"F{j}": capacity for j in range(n_facilities)},
+        "demand_quantities": {f"PRAC{i}": 1 for i in range(n_demand)},
+        "fixcost": 5.0,
+    }
+
+
+_original_apply_portfolio_config = solver_util._apply_portfolio_config
+
+
+def _misbehaving_apply_portfolio_config(model, config, gap):
+    """Simulates a worker stuck before its first SCIP event or one that crashes."""
+    if config["name"] == "stuck":
+        time.sleep(60)
+    if config["name"] == "crash":
+        os._exit(3)
+    if config["name"] == "late_error":
+        time.sleep(0.3)
+        config = {"params": {"no/such/param": 1}}
+    _original_apply_portfolio_config(model, config, gap)
+
+
+_original_winner_reported = solver_util._portfolio_winner_reported
+
+
+def _slow_winner_reported(outcomes, primal):
+    """Delays the parent once the winner is in, so other workers report meanwhile."""
+    reported = _original_winner_reported(outcomes, primal)
+    if reported:
+        time.sleep(1.0)
+    return reported
+
+
+class _RecordingModel(solver_util.Model):
+    """Records the objective limits set by the portfolio event handler."""
+
+    objlimits = []
+
+    def setObjlimit(self, objlimit):
+        type(self).objlimits.append(objlimit)
+        super().setObjlimit(objlimit)
+
+
+def _printed_lines(mock_print):
+    return [str(c.args[0]) for c in mock_print.call_args_list if c.args]
+
+
+class TestFixedFacilityEvaluation(unittest.TestCase):
+    # Testcase 1: Capacity forces the second-best assignment
+    def test_fixed_open_set_respects_capacity(self):
+        cost_matrix = {
+            "PRAC1": {"F_A": 1, "F_B": 10},
+            "PRAC2": {"F_A": 2, "F_B": 8},
+            "PRAC3": {"F_A": 3, "F_B": 5},
+        }
+        demand_quantities = {"PRAC1": 1, "PRAC2": 1, "PRAC3": 1}
+        capacities = {"F_A": 2, "F_B": 1}
+
+        assignments, facility_loads, total_cost = evaluate_fixed_facilities(
+            cost_matrix=cost_matrix,
+            facility_capacities=capacities,
+            demand_quantities=demand_quantities,
+            open_facilities=["F_A", "F_B"],
+            fixcost=0.5,
+        )
+
+        self.assertEqual(assignments, {"PRAC1": "F_A", "PRAC2": "F_A", "PRAC3": "F_B"})
+        self.assertEqual(facility_loads, {"F_A": 2.0, "F_B": 1.0})
+        self.assertAlmostEqual(total_cost, 1 + 2 + 5 + 2 * 0.5)
+
+    # Testcase 2: Batch evaluation, including an infeasible open-set
+    def test_batch_evaluation(self):
+        cost_matrix = {
+            "PRAC1": {"F_A": 1, "F_B": 100},
+            "PRAC2": {"F_A": 100, "F_B": 1},
+        }
+        demand_quantities = {"PRAC1": 1, "PRAC2": 1}
+        capacities = {"F_A": 1, "F_B": 2}
+
+        results = evaluate_open_sets(
+            cost_matrix=cost_matrix,
+            facility_capacities=capacities,
+            demand_quantities=demand_quantities,
+            open_sets=[["F_A", "F_B"], ["F_B"], ["F_A"]],
+            fixcost=1.0,
+        )
+
+        self.assertEqual(len(results), 3)
+        self.assertAlmostEqual(results[0][2], 1 + 1 + 2 * 1.0)
+        self.assertEqual(results[1][0], {"PRAC1": "F_B", "PRAC2": "F_B"})
+        self.assertAlmostEqual(results[1][2], 100 + 1 + 1.0)
+        self.assertEqual(results[2][0], {})
+        self.assertEqual(results[2][2], float("inf"))
+
+    # Testcase 3: Unknown facility in the open set
+    def test_unknown_facility_raises(self):
+        with self.assertRaises(ValueError):
+            evaluate_fixed_facilities(
+                cost_matrix={"PRAC1": {"F_A": 1}},
+                facility_capacities={"F_A": 1},
+                demand_quantities={"PRAC1": 1},
+                open_facilities=["F_X"],
+            )
+
+    # Testcase 4: A demand point only reachable through a missing pair
+    def test_missing_pair_is_infeasible(self):
+        cost_matrix = {
+            "PRAC1": {"F_A": 1},
+            "PRAC2": {"F_B": 1},
+        }
+        demand_quantities = {"PRAC1": 1, "PRAC2": 1}
+        capacities = {"F_A": 2, "F_B": 2}
+
+        results = evaluate_open_sets(
+            cost_matrix=cost_matrix,
+            facility_capacities=capacities,
+            demand_quantities=demand_quantities,
+            open_sets=[["F_A"], ["F_A", "F_B"]],
+        )
+
+        self.assertEqual(results[0], ({}, {"F_A": 0.0}, float("inf")))
+        self.assertEqual(results[1][0], {"PRAC1": "F_A", "PRAC2": "F_B"})
+        self.assertAlmostEqual(results[1][2], 2 + 2 * 0.001)
+
+    # Testcase 5: Large real costs are not mistaken for missing pairs
+    def test_large_cost_is_feasible(self):
+        assignments, facility_loads, total_cost = evaluate_fixed_facilities(
+            cost_matrix={"PRAC1": {"F_A": 2e9}},
+            facility_capacities={"F_A": 1},
+            demand_quantities={"PRAC1": 1},
+            open_facilities=["F_A"],
+            fixcost=0.0,
+        )
+
+        self.assertEqual(assignments, {"PRAC1": "F_A"})
+        self.assertEqual(facility_loads, {"F_A": 1.0})
+        self.assertAlmostEqual(total_cost, 2e9)
+
+    # Testcase 6: The transportation LP fallback gives the same results
+    def test_transportation_lp_fallback(self):
+        cost_matrix = {
+            "PRAC1": {"F_A": 1, "F_B": 10},
+            "PRAC2": {"F_A": 2, "F_B": 8},
+            "PRAC3": {"F_A": 3},
+        }
+        demand_quantities = {"PRAC1": 1, "PRAC2": 1, "PRAC3": 1}
+        capacities = {"F_A": 2, "F_B": 2}
+
+        with patch("helper.solver_util._MAX_EXPANDED_ENTRIES", 0):
+            results = evaluate_open_sets(
+                cost_matrix=cost_matrix,
+                facility_capacities=capacities,
+                demand_quantities=demand_quantities,
+                open_sets=[["F_A", "F_B"], ["F_B"]],
+                fixcost=0.5,
+            )
+
+        self.assertEqual(
+            results[0][0], {"PRAC1": "F_A", "PRAC2": "F_B", "PRAC3": "F_A"}
+        )
+        self.assertEqual(results[0][1], {"F_A": 2.0, "F_B": 1.0})
+        self.assertAlmostEqual(results[0][2], 1 + 8 + 3 + 2 * 0.5)
+        self.assertEqual(results[1], ({}, {"F_B": 0.0}, float("inf")))
+
+    # Testcase 7: Unequal demand quantities are rejected
+    def test_non_uniform_demand_raises(self):
+        with self.assertRaises(ValueError):
+            evaluate_fixed_facilities(
+                cost_matrix={"PRAC1": {"F_A": 1}, "PRAC2": {"F_A": 1}},
+                facility_capacities={"F_A": 3},
+                demand_quantities={"PRAC1": 1, "PRAC2": 2},
+                open_facilities=["F_A"],
+            )
+
+    # Testcase 8: Empty instance goes through the same validation
+    def test_empty_cost_matrix(self):
+        results = evaluate_open_sets(
+            cost_matrix={},
+            facility_capacities={},
+            demand_quantities={},
+            open_sets=[[]],
+        )
+        self.assertEqual(results, [({}, {}, 0.0)])
+
+        with self.assertRaises(ValueError):
+            evaluate_open_sets(
+                cost_matrix={},
+                facility_capacities={},
+                demand_quantities={},
+                open_sets=[["F_A"]],
+            )
+
+
+class TestSolveCapacitatedFLP(unittest.TestCase):
+    # Testcase 1: Capacity limit blocks assignment
+    def test_capacity_blocking(self):
+        with patch("builtins.print"), patch("helper.solver_util._save_assignments"):
+            open_facilities, assignments, solving_time = solve_capacitated_flp(
+                **CAPACITY_BLOCKING_INSTANCE
+            )
+
+        self.assertEqual(set(open_facilities), {"F_A", "F_B"})
+        self.assertEqual(assignments, {"PRAC1": "F_A", "PRAC2": "F_A", "PRAC3": "F_B"})
+
+    # Testcase 2: Empty cost matrix
+    def test_empty_cost_matrix(self):
+        with patch("builtins.print"):
+            result = solve_capacitated_flp(
+                cost_matrix={}, facility_capacities={}, demand_quantities={}
+            )
+
+        self.assertEqual(result, ([], {}, 0.0))
+
+    # Testcase 3: Demand points without facilities exit before validation
+    def test_no_facilities_skips_validation(self):
+        with patch("builtins.print"):
+            result = solve_capacitated_flp(
+                cost_matrix={"PRAC1": {}}, facility_capacities={}, demand_quantities={}
+            )
+
+        self.assertEqual(result, ([], {}, 0.0))
+
+    # Testcase 4: Missing capacity is reported
+    def test_missing_capacity_raises(self):
+        with patch("builtins.print"), self.assertRaises(ValueError):
+            solve_capacitated_flp(
+                cost_matrix={"PRAC1": {"F_A": 1}},
+                facility_capacities={},
+                demand_quantities={"PRAC1": 1},
+            )
+
+
+class TestPortfolioGap(unittest.TestCase):
+    def test_gap_values(self):
+        self.assertAlmostEqual(_portfolio_gap(10.0, 9.0), 1 / 9)
+        self.assertEqual(_portfolio_gap(10.0, 10.0), 0.0)
+        # No incumbent or no dual bound yet
+        self.assertEqual(_portfolio_gap(1e20, 5.0), float("inf"))
+        self.assertEqual(_portfolio_gap(float("inf"), 5.0), float("inf"))
+        self.assertEqual(_portfolio_gap(10.0, -1e20), float("inf"))
+        # Bounds of different sign or at zero
+        self.assertEqual(_portfolio_gap(5.0, -5.0), float("inf"))
+        self.assertEqual(_portfolio_gap(5.0, 0.0), float("inf"))
+
+
+class TestPortfolioWorker(unittest.TestCase):
+    # Finds no solution on its own: no LP, no heuristics and only the root node
+    BLIND_CONFIG = {
+        "name": "blind",
+        "heuristics": "off",
+        "params": {"presolving/maxrounds": 0, "lp/solvefreq": -1, "limits/nodes": 1},
+    }
+
+    def _shared_state(self, instance):
+        return {
+            "primal": mp.Value("d", float("inf")),
+            "dual": mp.Value("d", float("-inf")),
+            "incumbent": mp.Array("i", len(instance["cost_matrix"]), lock=False),
+            "version": mp.Value("i", 0, lock=False),
+            "stop_event": mp.Event(),
+        }
+
+    def _run_worker(self, instance, shared, config=None, gap=0.0):
+        results = mp.Queue()
+        config = config or {"name": "worker", "params": {"presolving/maxrounds": 0}}
+        _portfolio_worker(
+            0,
+            config,
+            instance["cost_matrix"],
+            instance["facility_capacities"],
+            instance["demand_quantities"],
+            instance["fixcost"],
+            60,
+            gap,
+            shared,
+            results,
+        )
+        index, outcome = results.get(timeout=5)
+        self.assertEqual(index, 0)
+        return outcome
+
+    # Testcase 1: Incumbent and bounds are published to the shared state
+    def test_worker_publishes_incumbent_and_bounds(self):
+        instance = _random_instance()
+        shared = self._shared_state(instance)
+
+        _, status, obj, _, assignments = self._run_worker(instance, shared)
+
+        self.assertEqual(status, "optimal")
+        version, shared_obj, chosen = _read_incumbent(shared)
+        self.assertGreater(version, 0)
+        self.assertAlmostEqual(shared_obj, obj)
+        demand_points_ids, facilities_ids = _collect_ids(instance["cost_matrix"])
+        self.assertEqual(
+            _decode_incumbent(chosen, demand_points_ids, facilities_ids)[1],
+            assignments,
+        )
+        self.assertGreater(shared["dual"].value, -1e20)
+        self.assertLessEqual(shared["dual"].value, obj + 1e-6)
+        self.assertTrue(shared["stop_event"].is_set())
+
+    # Testcase 2: Another worker's incumbent is injected into the search
+    def test_worker_uses_shared_incumbent(self):
+        instance = _random_instance()
+        shared = self._shared_state(instance)
+        _, _, optimum, _, assignments = self._run_worker(instance, shared)
+        shared["stop_event"].clear()
+
+        _, _, obj, _, blind_assignments = self._run_worker(
+            instance, shared, config=self.BLIND_CONFIG
+        )
+        self.assertAlmostEqual(obj, optimum)
+        self.assertEqual(blind_assignments, assignments)
+
+        # Without a shared incumbent the same configuration finds nothing
+        _, _, obj, _, _ = self._run_worker(
+            instance, self._shared_state(instance), config=self.BLIND_CONFIG
+        )
+        self.assertEqual(obj, float("inf"))
+
+    # Testcase 3: Pruned by the shared objective limit, the worker reports the
+    # shared incumbent as optimal
+    def test_worker_objective_limit_from_shared_incumbent(self):
+        instance = dict(_random_instance(capacity=5), fixcost=60.0)
+        shared = self._shared_state(instance)
+        _, _, optimum, _, assignments = self._run_worker(instance, shared)
+        shared["stop_event"].clear()
+        shared["dual"].value = float("-inf")
+
+        config = {
+            "name": "limited",
+            "formulation": "aggregated",
+            "heuristics": "off",
+            "params": {
+                "heuristics/portfolio/freq": -1,
+                "presolving/maxrounds": 0,
+                "separating/maxrounds": 0,
+                "separating/maxroundsroot": 0,
+            },
+        }
+        with patch("helper.solver_util.Model", _RecordingModel):
+            _RecordingModel.objlimits = []
+            _, status, obj, _, limited_assignments = self._run_worker(
+                instance, shared, config=config
+            )
+
+        self.assertEqual(_RecordingModel.objlimits, [optimum])
+        self.assertEqual(status, "optimal")
+        self.assertAlmostEqual(obj, optimum)
+        self.assertEqual(limited_assignments, assignments)
+        self.assertTrue(shared["stop_event"].is_set())
+
+    # Testcase 4: A set stop event interrupts the solve
+    def test_worker_interrupted_by_stop_event(self):
+        instance = _random_instance()
+        shared = self._shared_state(instance)
+        shared["stop_event"].set()
+
+        _, status, _, _, _ = self._run_worker(instance, shared)
+
+        self.assertEqual(status, "userinterrupt")
+
+    # Testcase 5: Another worker's bounds close the gap and stop this one
+    def test_worker_stops_on_combined_gap(self):
+        instance = _random_instance()
+        shared = self._shared_state(instance)
+        optimum = self._run_worker(instance, shared)[2]
+        shared["stop_event"].clear()
+        shared["dual"].value = optimum
+
+        _, status, obj, _, _ = self._run_worker(instance, shared)
+
+        self.assertEqual(status, "userinterrupt")
+        self.assertTrue(shared["stop_event"].is_set())
+
+
+class TestPortfolioSolver(unittest.TestCase):
+    # Testcase 1: Portfolio finds the same optimum as the single solve
+    def test_portfolio_matches_single_solve(self):
+        configs = [
+            {"name": "default"},
+            {"name": "aggregated", "formulation": "aggregated", "seed": 1},
+        ]
+
+        with patch("builtins.print"), patch("helper.solver_util._save_assignments"):
+            open_facilities, assignments, solving_time = (
+                solve_capacitated_flp_portfolio(
+                    **CAPACITY_BLOCKING_INSTANCE, configs=configs, n_workers=2
+                )
+            )
+
+        self.assertEqual(set(open_facilities), {"F_A", "F_B"})
+        self.assertEqual(assignments, {"PRAC1": "F_A", "PRAC2": "F_A", "PRAC3": "F_B"})
+
+    # Testcase 2: Empty cost matrix
+    def test_portfolio_empty_cost_matrix(self):
+        with patch("builtins.print"):
+            open_facilities, assignments, solving_time = (
+                solve_capacitated_flp_portfolio(
+                    cost_matrix={}, facility_capacities={}, demand_quantities={}
+                )
+            )
+
+        self.assertEqual(open_facilities, [])
+        self.assertEqual(assignments, {})
+        self.assertAlmostEqual(solving_time, 0.0)
+
+    # Testcase 3: n_workers truncates the configurations
+    def test_n_workers_truncates_configs(self):
+        configs = [{"name": "first"}, {"name": "second"}, {"name": "third"}]
+
+        with (
+            patch("builtins.print") as mock_print,
+            patch("helper.solver_util._save_assignments"),
+        ):
+            solve_capacitated_flp_portfolio(
+                **CAPACITY_BLOCKING_INSTANCE, configs=configs, n_workers=1
+            )
+
+        lines = _printed_lines(mock_print)
+        self.assertIn("Starting 1 portfolio workers...", lines)
+        self.assertTrue(any(line.startswith("  first:") for line in lines))
+        self.assertFalse(any(line.startswith("  second:") for line in lines))
+
+    # Testcase 4: An invalid SCIP parameter is reported without hanging
+    def test_worker_error_is_reported(self):
+        configs = [{"name": "bad", "params": {"no/such/param": 1}}]
+
+        with patch("builtins.print") as mock_print:
+            result = solve_capacitated_flp_portfolio(
+                **CAPACITY_BLOCKING_INSTANCE, configs=configs, n_workers=1
+            )
+
+        self.assertEqual(result[:2], ([], {}))
+        lines = _printed_lines(mock_print)
+        self.assertTrue(any(line.startswith("  bad: error: ") for line in lines))
+
+
+@unittest.skipUnless(
+    "fork" in mp.get_all_start_methods(), "patched workers need the fork start method"
+)
+class TestPortfolioStopping(unittest.TestCase):
+    # Testcase 1: One worker finishes, stuck and crashed workers do not block it
+    def test_finished_worker_stops_the_others(self):
+        configs = [
+            {"name": "default"},
+            {"name": "stuck"},
+            {"name": "crash"},
+            {"name": "bad", "params": {"no/such/param": 1}},
+        ]
+
+        start = time.time()
+        with (
+            patch("builtins.print") as mock_print,
+            patch("helper.solver_util._save_assignments"),
+            patch(
+                "helper.solver_util.mp.get_context", return_value=mp.get_context("fork")
+            ),
+            patch(
+                "helper.solver_util._apply_portfolio_config",
+                _misbehaving_apply_portfolio_config,
+            ),
+        ):
+            open_facilities, assignments, solving_time = (
+                solve_capacitated_flp_portfolio(
+                    **CAPACITY_BLOCKING_INSTANCE, configs=configs, n_workers=4
+                )
+            )
+
+        self.assertLess(time.time() - start, 30)
+        self.assertEqual(assignments, {"PRAC1": "F_A", "PRAC2": "F_A", "PRAC3": "F_B"})
+        lines = _printed_lines(mock_print)
+        self.assertIn("  default: optimal | Objective: 9.00", lines)
+        self.assertIn("  stuck: terminated | Objective: inf", lines)
+        self.assertIn("  crash: died (exit code 3) | Objective: inf", lines)
+        self.assertTrue(any(line.startswith("  bad: error: ") for line in lines))
+
+    # Testcase 2: Results sent after the winner are not reported as dead workers
+    def test_late_results_are_drained(self):
+        configs = [{"name": "default"}, {"name": "late_error"}]
+
+        with (
+            patch("builtins.print") as mock_print,
+            patch("helper.solver_util._save_assignments"),
+            patch(
+                "helper.solver_util.mp.get_context", return_value=mp.get_context("fork")
+            ),
+            patch(
+                "helper.solver_util._apply_portfolio_config",
+                _misbehaving_apply_portfolio_config,
+            ),
+            patch(
+                "helper.solver_util._portfolio_winner_reported", _slow_winner_reported
+            ),
+        ):
+            solve_capacitated_flp_portfolio(
+                **CAPACITY_BLOCKING_INSTANCE, configs=configs, n_workers=2
+            )
+
+        lines = _printed_lines(mock_print)
+        self.assertIn("  default: optimal | Objective: 9.00", lines)
+        self.assertTrue(any(line.startswith("  late_error: error: ") for line in lines))
+
+
+if __name__ == "__main__":
+    unittest.main()